@@ -0,0 +1,80 @@
+import functools
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import run_alphafold
+import status_store
+from constants import PIN_WORKER_CPUS
+from gpu_utils import get_gpu_count
+
+logger = logging.getLogger(__name__)
+
+# One long-lived worker per GPU; jobs beyond that wait in the executor's queue
+_executor = None
+_free_gpus = queue.Queue()
+_start_lock = threading.Lock()
+
+# CPUs the process may run on, for picking each GPU's launcher core
+_ALL_CORES = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+
+
+def start_workers():
+    """Start the worker pool, sized to the number of GPUs. Safe to call repeatedly."""
+    global _executor
+    with _start_lock:
+        if _executor is not None:
+            return
+
+        num_gpus = get_gpu_count()
+        if num_gpus:
+            for gpu_index in range(num_gpus):
+                _free_gpus.put(str(gpu_index))
+        else:
+            # No GPU visible: run one job at a time and let AlphaFold pick devices
+            _free_gpus.put(None)
+
+        _executor = ThreadPoolExecutor(
+            max_workers=max(num_gpus, 1), thread_name_prefix="alphafold-worker"
+        )
+        logger.info(f"Started AlphaFold worker pool with {max(num_gpus, 1)} worker(s)")
+
+
+def _core_for_gpu(gpu_index):
+    """
+    Pick the CPU core the AlphaFold launcher for a GPU is pinned to. Only the
+    launcher is pinned: threads the worker starts (uploads, GPU poller) are
+    shared across jobs and would inherit the worker's affinity.
+    """
+    return _ALL_CORES[gpu_index % len(_ALL_CORES)]
+
+
+def _run_on_gpu(job_id, args):
+    gpu_devices = _free_gpus.get()
+    try:
+        cpu_core = None
+        if PIN_WORKER_CPUS and _ALL_CORES:
+            cpu_core = _core_for_gpu(int(gpu_devices) if gpu_devices is not None else 0)
+        logger.info(f"Running job {job_id} on GPU {gpu_devices if gpu_devices is not None else 'all'}")
+        run_alphafold.run_alphafold(*args, gpu_devices=gpu_devices, cpu_core=cpu_core)
+    finally:
+        _free_gpus.put(gpu_devices)
+
+
+def _job_done(job_id, future):
+    # run_alphafold records its own errors; this catches anything that escapes it
+    exc = future.exception()
+    if exc is not None:
+        logger.error(f"AlphaFold worker failed for job {job_id}", exc_info=exc)
+        status_store.update(job_id, status="error", message=str(exc))
+
+
+def submit(job_id, args):
+    """Queue a job for the next free GPU worker."""
+    start_workers()
+    status_store.replace(job_id, status="queued", progress=0)
+    future = _executor.submit(_run_on_gpu, job_id, args)
+    future.add_done_callback(functools.partial(_job_done, job_id))
+    return future
@@ -1,28 +1,80 @@
+import atexit
 import logging
 import os
-import subprocess
 import threading
 import time
 
+try:
+    import docker
+except ImportError:
+    docker = None
+
+import alphafold_worker
 import run_alphafold
-from constants import DATA_DIR, OUTPUT_DIR, SEQUENCES_DIR
+import status_store
+from constants import (
+    DATA_DIR,
+    OUTPUT_DIR,
+    SEQUENCES_DIR,
+    STALE_SEQUENCE_AGE,
+    USE_PERSISTENT_WORKER,
+)
 from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
-from gpu_utils import check_docker_gpu_access, check_system_gpu
+from gpu_utils import (
+    check_docker_gpu_access,
+    check_system_gpu,
+    get_detailed_gpu_info,
+    get_gpu_container_ids,
+    init_nvml,
+    shutdown_nvml,
+    warm_docker_gpu_probe,
+)
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Let a fronting proxy (nginx/ALB) send result files via X-Sendfile
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE") == "1"
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Initialize NVML once up front so /gpu-info never pays for it
+init_nvml()
+atexit.register(shutdown_nvml)
+
+# Pull the Docker GPU probe image and cache its result off the request path
+threading.Thread(target=warm_docker_gpu_probe, name="docker-probe-warmup", daemon=True).start()
+
 # Create directories if they don't exist
 for directory in [DATA_DIR, OUTPUT_DIR, SEQUENCES_DIR]:
     os.makedirs(directory, exist_ok=True)
 
-# Store job statuses
-job_status = {}
+# Remove FASTA files left behind by earlier runs
+for entry in os.scandir(SEQUENCES_DIR):
+    try:
+        if (
+            entry.name.endswith(".fasta")
+            and time.time() - entry.stat().st_mtime > STALE_SEQUENCE_AGE
+        ):
+            os.remove(entry.path)
+    except OSError as e:
+        logger.warning(f"Could not remove stale FASTA file {entry.path}: {e}")
+
+
+# Docker SDK client, created on first use and reused across requests
+docker_client = None
+
+
+def get_docker_client():
+    global docker_client
+    if docker_client is None:
+        if docker is None:
+            raise RuntimeError("Docker SDK for Python is not installed")
+        docker_client = docker.from_env()
+    return docker_client
 
 
 @app.route("/predict", methods=["POST"])
@@ -39,38 +91,26 @@ def predict():
         bucket_name = data.get("storageAccount") if platform == 'aws' else data.get('bucketName')
         object_key = data.get("blobName") if platform == 'azure' else  data.get("objectKey")
 
-        if platform == 'azure':
-            container_name = data.get('containerName')
-
         job_id = data.get("jobId")
 
-        # Start AlphaFold in a separate thread
-        if platform == 'azure':
-            args=(
-                job_id,
-                sequence,
-                name,
-                job_status,
-                storage_url,
-                bucket_name,
-                object_key,
-                container_name
-            )
+        # Start AlphaFold in a separate thread. Results are uploaded through S3 or
+        # the pre-signed storageUrl; there is no Azure upload, so containerName is unused
+        args=(
+            job_id,
+            sequence,
+            name,
+            storage_url,
+            bucket_name,
+            object_key,
+        )
+
+        if USE_PERSISTENT_WORKER:
+            alphafold_worker.submit(job_id, args)
         else:
-            args=(
-                job_id,
-                sequence,
-                name,
-                job_status,
-                storage_url,
-                bucket_name,
-                object_key,
+            thread = threading.Thread(
+                target=run_alphafold.run_alphafold, args=args
             )
-
-        thread = threading.Thread(
-            target=run_alphafold.run_alphafold, args=args
-        )
-        thread.start()
+            thread.start()
 
         return jsonify({"job_id": job_id, "status": "submitted"})
 
@@ -81,18 +121,19 @@ def predict():
 
 @app.route("/status/<job_id>", methods=["GET"])
 def get_status(job_id):
-    if job_id not in job_status:
+    status = status_store.get(job_id)
+    if status is None:
         return jsonify({"error": "Job not found"}), 404
 
-    return jsonify(job_status[job_id])
+    return jsonify(status)
 
 
 @app.route("/result/<job_id>", methods=["GET"])
 def get_result(job_id):
-    if job_id not in job_status:
+    status = status_store.get(job_id)
+    if status is None:
         return jsonify({"error": "Job not found"}), 404
 
-    status = job_status[job_id]
     if status["status"] != "completed":
         return jsonify({"error": "Job not completed yet"}), 400
 
@@ -100,10 +141,28 @@ def get_result(job_id):
     if not result_file:
         return jsonify({"error": "Result file not found"}), 404
 
-    if not os.path.exists(result_file):
-        return jsonify({"error": "Result file does not exist"}), 404
+    # Completed jobs record the result's mtime for Last-Modified, so only check
+    # for the file here for jobs that finished without it
+    last_modified = status.get("result_mtime")
+    if last_modified is None:
+        if not os.path.exists(result_file):
+            return jsonify({"error": "Result file does not exist"}), 404
+        last_modified = os.path.getmtime(result_file)
 
-    return send_file(result_file, as_attachment=True)
+    # Conditional requests let clients that already have the file get a 304
+    try:
+        response = send_file(
+            result_file,
+            as_attachment=True,
+            conditional=True,
+            etag=True,
+            last_modified=last_modified,
+            max_age=3600,
+        )
+    except FileNotFoundError:
+        return jsonify({"error": "Result file does not exist"}), 404
+    response.cache_control.public = True
+    return response
 
 
 @app.route("/health", methods=["GET"])
@@ -120,35 +179,16 @@ def gpu_info():
         # Check Docker GPU access
         docker_gpu, docker_gpu_info = check_docker_gpu_access()
 
-        # Get detailed GPU information using nvidia-smi
-        detailed_info = {}
+        # Get detailed GPU information (NVML, falling back to nvidia-smi)
         try:
-            nvidia_smi = subprocess.run(
-                [
-                    "nvidia-smi",
-                    "--query-gpu=index,name,driver_version,temperature.gpu,utilization.gpu,utilization.memory,memory.total,memory.free,memory.used",
-                    "--format=csv",
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-
-            if nvidia_smi.returncode == 0:
-                lines = nvidia_smi.stdout.strip().split("\n")
-                if len(lines) > 1:  # Header + at least one GPU
-                    headers = [h.strip() for h in lines[0].split(",")]
-                    for i, line in enumerate(lines[1:]):
-                        values = [v.strip() for v in line.split(",")]
-                        gpu_data = {headers[j]: values[j] for j in range(len(headers))}
-                        detailed_info[f"gpu_{i}"] = gpu_data
+            detailed_info = get_detailed_gpu_info()
         except Exception as e:
             logger.error(f"Error getting detailed GPU info: {e}")
             detailed_info = {"error": str(e)}
 
         # Get GPU usage in current jobs
         jobs_using_gpu = []
-        for job_id, status in job_status.items():
+        for job_id, status in status_store.iter_jobs():
             if status.get("gpu_usage_detected", False) or status.get(
                 "gpu_verification", {}
             ).get("gpu_used", False):
@@ -165,41 +205,27 @@ def gpu_info():
         # Get Docker container GPU usage
         docker_containers = []
         try:
-            containers = subprocess.run(
-                ["docker", "ps", "--format", "{{.ID}}\t{{.Names}}\t{{.Image}}"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-
-            if containers.returncode == 0:
-                container_lines = containers.stdout.strip().split("\n")
-                for line in container_lines:
-                    if line:
-                        parts = line.split("\t")
-                        if len(parts) >= 3:
-                            container_id, name, image = parts
-
-                            # Check if this container is using GPU
-                            try:
-                                # Try to run nvidia-smi inside the container
-                                test = subprocess.run(
-                                    ["docker", "exec", container_id, "nvidia-smi"],
-                                    capture_output=True,
-                                    text=True,
-                                )
-                                using_gpu = test.returncode == 0
-                            except:
-                                using_gpu = False
-
-                            docker_containers.append(
-                                {
-                                    "id": container_id,
-                                    "name": name,
-                                    "image": image,
-                                    "using_gpu": using_gpu,
-                                }
-                            )
+            # sparse=True uses the list endpoint only, with no inspect per container
+            containers = get_docker_client().containers.list(sparse=True)
+
+            # One GPU process query for all containers instead of a
+            # `docker exec nvidia-smi` per container
+            try:
+                gpu_container_ids = get_gpu_container_ids()
+            except Exception as e:
+                logger.error(f"Error listing GPU processes: {e}")
+                gpu_container_ids = set()
+
+            for container in containers:
+                names = container.attrs.get("Names") or [""]
+                docker_containers.append(
+                    {
+                        "id": container.short_id,
+                        "name": names[0].lstrip("/"),
+                        "image": container.attrs.get("Image", ""),
+                        "using_gpu": container.id in gpu_container_ids,
+                    }
+                )
         except Exception as e:
             logger.error(f"Error checking Docker containers: {e}")
             docker_containers = [{"error": str(e)}]
@@ -221,5 +247,6 @@ def gpu_info():
         return jsonify({"error": str(e)}), 500
 
 
+# Development server only; in production run `gunicorn -c gunicorn_conf.py app:app`
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
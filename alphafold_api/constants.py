@@ -5,6 +5,40 @@ BASE_DIR = os.path.expanduser("~")
 ALPHAFOLD_REPO = os.path.join(BASE_DIR, "alphafold")
 DATA_DIR = os.path.join(BASE_DIR, "alphafold_data")
 OUTPUT_DIR = os.path.join(BASE_DIR, "alphafold_output")
-SEQUENCES_DIR = os.path.join(BASE_DIR, "alphafold_sequences")
+# FASTA inputs are tiny and short-lived, so keep them on tmpfs when available
+SEQUENCES_DIR = (
+    "/dev/shm/alphafold_sequences"
+    if os.path.ismount("/dev/shm")
+    else os.path.join(BASE_DIR, "alphafold_sequences")
+)
 
+# FASTA files older than this (seconds) are removed when the API starts
+STALE_SEQUENCE_AGE = 24 * 60 * 60
 
+
+
+# How long (seconds) GPU/Docker capability probes are cached between jobs
+GPU_PROBE_TTL = float(os.environ.get("GPU_PROBE_TTL", 300))
+
+# Run jobs on a fixed pool of workers (one per GPU) instead of a thread per request.
+# Set USE_PERSISTENT_WORKER=0 to fall back to the thread-per-request path.
+USE_PERSISTENT_WORKER = os.environ.get("USE_PERSISTENT_WORKER", "1") != "0"
+
+# Share job status across processes through Redis; leave unset for the in-memory store
+REDIS_URL = os.environ.get("REDIS_URL")
+
+# Multipart settings for result uploads to S3
+S3_MULTIPART_CHUNKSIZE = int(os.environ.get("S3_MULTIPART_CHUNKSIZE", 8 * 1024 * 1024))
+S3_MAX_CONCURRENCY = int(os.environ.get("S3_MAX_CONCURRENCY", 8))
+
+# Seconds between GPU usage samples for running jobs; unset picks a default
+# based on whether NVML is available
+GPU_POLL_INTERVAL = float(os.environ["GPU_POLL_INTERVAL"]) if os.environ.get("GPU_POLL_INTERVAL") else None
+
+# Pin the run_docker.py client each job launches to one CPU core chosen by
+# GPU index. Set PIN_WORKER_CPUS=1 to enable
+PIN_WORKER_CPUS = os.environ.get("PIN_WORKER_CPUS") == "1"
+
+# Extra AlphaFold outputs (comma-separated file names, e.g. "ranking_debug.json,timings.json")
+# uploaded next to the result PDB, under "<result key without extension>/<name>"
+EXTRA_RESULT_FILES = [name.strip() for name in os.environ.get("EXTRA_RESULT_FILES", "").split(",") if name.strip()]
@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+import status_store
+from constants import GPU_POLL_INTERVAL
+from gpu_utils import init_nvml, sample_gpu_usage
+
+logger = logging.getLogger(__name__)
+
+# Seconds between GPU samples when GPU_POLL_INTERVAL isn't set. An NVML sample
+# costs microseconds; the nvidia-smi fallback forks a process per sample
+NVML_POLL_INTERVAL = 1
+NVIDIA_SMI_POLL_INTERVAL = 10
+
+
+class GpuPoller:
+    """
+    One background thread that samples each GPU in use once per tick and
+    copies the sample into the status of every job running on that GPU.
+    """
+
+    def __init__(self, interval=GPU_POLL_INTERVAL):
+        self.interval = interval
+        self._subscribers = {}  # job_id -> GPU index
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, job_id, gpu_index=0):
+        """Start reporting GPU usage for job_id; starts the poller thread on first use."""
+        with self._lock:
+            self._subscribers[job_id] = gpu_index
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="gpu-poller", daemon=True
+                )
+                self._thread.start()
+
+    def unsubscribe(self, job_id):
+        with self._lock:
+            self._subscribers.pop(job_id, None)
+
+    def _run(self):
+        interval = self.interval or (
+            NVML_POLL_INTERVAL if init_nvml() else NVIDIA_SMI_POLL_INTERVAL
+        )
+        while True:
+            with self._lock:
+                subscribers = dict(self._subscribers)
+
+            if subscribers:
+                try:
+                    self._poll(subscribers)
+                except Exception as e:
+                    logger.error(f"Error monitoring GPU: {str(e)}")
+
+            time.sleep(interval)
+
+    def _poll(self, subscribers):
+        samples = {}
+        for gpu_index in set(subscribers.values()):
+            sample = sample_gpu_usage(gpu_index)
+            if sample:
+                utilization, memory_used, memory_total = sample
+                samples[gpu_index] = {
+                    "utilization": utilization,
+                    "memory_used": memory_used,
+                    "memory_total": memory_total,
+                    "time": int(time.time()),
+                }
+                logger.debug(
+                    f"GPU {gpu_index} utilization: {utilization}, Memory: {memory_used}/{memory_total}"
+                )
+
+        for job_id, gpu_index in subscribers.items():
+            if gpu_index in samples:
+                status_store.update(job_id, gpu_info=samples[gpu_index])
+
+
+poller = GpuPoller()
+
+
+def subscribe(job_id, gpu_index=0):
+    poller.subscribe(job_id, gpu_index)
+
+
+def unsubscribe(job_id):
+    poller.unsubscribe(job_id)
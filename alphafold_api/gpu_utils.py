@@ -1,13 +1,221 @@
+import ctypes
+import functools
 import logging
+import mmap
 import os
+import re
 import subprocess
+import threading
 import time
 
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+from constants import GPU_PROBE_TTL
+
 logger = logging.getLogger(__name__)
 
+MIB = 1024 * 1024
+
+# Image used to check that Docker containers can see the GPU
+CUDA_PROBE_IMAGE = "nvidia/cuda:12.2.2-base-ubuntu20.04"
+
+# Lines in AlphaFold's log.txt that show it actually ran on a GPU
+GPU_KEYWORD_RE = re.compile(
+    r"Using GPU|CUDA_VISIBLE_DEVICES|TensorFlow device|device:GPU|Found device"
+    r"|XLA_PYTHON_CLIENT_MEM_FRACTION|cuda|jaxlib\.xla_extension\.GpuDevice"
+)
+GPU_KEYWORD_RE_BYTES = re.compile(GPU_KEYWORD_RE.pattern.encode())
+
+# Field names reported per GPU by get_detailed_gpu_info (nvidia-smi CSV headers)
+DETAILED_GPU_FIELDS = (
+    "index",
+    "name",
+    "driver_version",
+    "temperature.gpu",
+    "utilization.gpu [%]",
+    "utilization.memory [%]",
+    "memory.total [MiB]",
+    "memory.free [MiB]",
+    "memory.used [MiB]",
+)
+
+# Value reported for a field the GPU doesn't support, as nvidia-smi prints it
+NOT_AVAILABLE = "[N/A]"
+
+# Docker container IDs as they appear in /proc/<pid>/cgroup
+CONTAINER_ID_RE = re.compile(r"[0-9a-f]{64}")
+
+# Maximum number of evidence lines reported from log.txt
+MAX_GPU_EVIDENCE = 10
+
+# NVML is initialized once per process; None means "not attempted yet"
+_nvml_lock = threading.Lock()
+_nvml_ready = None
+
+
+def init_nvml():
+    """
+    Initialize NVML once for this process.
+    Returns True if NVML can be used, False if callers should fall back to nvidia-smi.
+    """
+    global _nvml_ready
+    if _nvml_ready is not None:
+        return _nvml_ready
+
+    with _nvml_lock:
+        if _nvml_ready is None:
+            if pynvml is None:
+                logger.info("pynvml not installed, falling back to nvidia-smi")
+                _nvml_ready = False
+            else:
+                try:
+                    pynvml.nvmlInit()
+                    _nvml_ready = True
+                except pynvml.NVMLError as e:
+                    logger.warning(f"NVML initialization failed, falling back to nvidia-smi: {e}")
+                    _nvml_ready = False
+        return _nvml_ready
+
+
+# Probe results keyed by function name: name -> (value, expires_at)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def ttl_cached(func):
+    """
+    Cache a probe's result for GPU_PROBE_TTL seconds. Concurrent callers
+    wait for a single in-flight probe instead of each running their own.
+    Like functools.lru_cache, the wrapper has a cache_clear() to force a rescan.
+    """
+    probe_lock = threading.Lock()
+    key = func.__name__
+
+    @functools.wraps(func)
+    def wrapper():
+        with probe_lock:
+            with _cache_lock:
+                entry = _cache.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+
+            value = func()
+            with _cache_lock:
+                _cache[key] = (value, time.monotonic() + GPU_PROBE_TTL)
+            return value
+
+    def cache_clear():
+        with _cache_lock:
+            _cache.pop(key, None)
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+def invalidate_gpu_cache():
+    """Drop cached GPU probe results, e.g. after a driver or runtime change."""
+    with _cache_lock:
+        _cache.clear()
+
 
+def shutdown_nvml():
+    """Release NVML if it was initialized; registered with atexit by the app."""
+    global _nvml_ready
+    with _nvml_lock:
+        if _nvml_ready:
+            try:
+                pynvml.nvmlShutdown()
+            except pynvml.NVMLError as e:
+                logger.warning(f"Error shutting down NVML: {e}")
+        _nvml_ready = None
+
+
+def _nvml_str(value):
+    """Older pynvml releases return bytes, newer ones return str."""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _nvml_optional(query, *args):
+    """
+    Run an NVML query for a single field, returning None when the device
+    doesn't support it (e.g. utilization on MIG-enabled GPUs).
+    """
+    try:
+        return query(*args)
+    except pynvml.NVMLError_NotSupported:
+        return None
+
+
+def _percent(rates, field):
+    return f"{getattr(rates, field)} %" if rates is not None else NOT_AVAILABLE
+
+
+def _mib(memory, field):
+    return f"{getattr(memory, field) // MIB} MiB" if memory is not None else NOT_AVAILABLE
+
+
+def cuda_available():
+    """
+    Cheap pre-flight check: True if the CUDA driver library loads and
+    reports at least one device. Takes microseconds, no subprocess.
+    """
+    try:
+        libcuda = ctypes.CDLL("libcuda.so.1")
+        if libcuda.cuInit(0) != 0:
+            return False
+        count = ctypes.c_int()
+        if libcuda.cuDeviceGetCount(ctypes.byref(count)) != 0:
+            return False
+        return count.value > 0
+    except (OSError, AttributeError):
+        return False
+
+
+def get_gpu_count():
+    """Return the number of GPUs visible on the host, or 0 if none can be found."""
+    if init_nvml():
+        try:
+            return pynvml.nvmlDeviceGetCount()
+        except pynvml.NVMLError as e:
+            logger.error(f"Error counting GPUs through NVML: {e}")
+            return 0
+
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "--list-gpus"], capture_output=True, text=True, check=True
+        )
+        return len([line for line in result.stdout.splitlines() if line.strip()])
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return 0
+
+
+@ttl_cached
 def check_system_gpu():
     """Check if GPU is available at the system level."""
+    if init_nvml():
+        try:
+            gpus = []
+            for i in range(pynvml.nvmlDeviceGetCount()):
+                handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+                name = _nvml_str(pynvml.nvmlDeviceGetName(handle))
+                memory = _nvml_optional(pynvml.nvmlDeviceGetMemoryInfo, handle)
+                gpus.append(
+                    f"{name}, {_mib(memory, 'total')}, {_mib(memory, 'free')}, {_mib(memory, 'used')}"
+                )
+
+            if gpus:
+                logger.info(f"GPU detected: {'; '.join(gpus)}")
+                return True, "\n".join(gpus)
+            else:
+                logger.warning("NVML reported no GPU devices")
+                return False, "No GPU devices reported by NVML"
+        except pynvml.NVMLError as e:
+            logger.error(f"Error querying GPU through NVML: {e}")
+            return False, str(e)
+
     try:
         result = subprocess.run(
             [
@@ -36,30 +244,35 @@ def check_system_gpu():
         return False, "nvidia-smi command not found"
 
 
+@ttl_cached
 def check_docker_gpu_access():
-    """Check if Docker has access to GPU."""
+    """
+    Check if Docker has access to GPU. Only checks that the GPU device node is
+    mounted into the container, which avoids running nvidia-smi inside it.
+    """
     try:
-        result = subprocess.run(
+        subprocess.run(
             [
                 "docker",
                 "run",
                 "--rm",
                 "--gpus=all",
-                "nvidia/cuda:12.2.2-base-ubuntu20.04",
-                "nvidia-smi",
+                CUDA_PROBE_IMAGE,
+                "test",
+                "-e",
+                "/dev/nvidia0",
             ],
             capture_output=True,
             text=True,
             check=True,
         )
 
-        if result.stdout:
-            logger.info(f"Docker GPU access confirmed")
-            return True, result.stdout.strip()
-        else:
-            logger.warning("Docker GPU test returned empty output")
-            return False, "No GPU information returned by Docker test"
+        logger.info(f"Docker GPU access confirmed")
+        return True, "GPU device /dev/nvidia0 visible inside Docker container"
     except subprocess.CalledProcessError as e:
+        if e.returncode == 1 and not e.stderr:
+            logger.warning("Docker container started but no GPU device is visible")
+            return False, "No GPU device visible inside Docker container"
         logger.error(f"Error testing Docker GPU access: {e}, output: {e.stderr}")
         return False, e.stderr
     except FileNotFoundError:
@@ -67,63 +280,85 @@ def check_docker_gpu_access():
         return False, "Docker command not found"
 
 
-def verify_alphafold_gpu_usage(job_id, output_dir):
+def warm_docker_gpu_probe():
+    """
+    Pull the probe image and run the Docker GPU probe once, so the first job
+    neither waits on an image pull nor on the probe itself.
+    Meant to run in a background thread at startup.
+    """
+    try:
+        subprocess.run(
+            ["docker", "pull", CUDA_PROBE_IMAGE],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        logger.info(f"Pulled Docker GPU probe image {CUDA_PROBE_IMAGE}")
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logger.warning(f"Could not pull Docker GPU probe image: {e}")
+        return
+
+    if cuda_available():
+        check_docker_gpu_access()
+
+
+def find_result_dir(job_dir):
+    """Return the path of the latest results directory in job_dir, or None."""
+    with os.scandir(job_dir) as entries:
+        return max(
+            (entry.path for entry in entries if entry.is_dir(follow_symlinks=False)),
+            default=None,
+        )
+
+
+def verify_alphafold_gpu_usage(job_id, output_dir, result_dir=None):
     """
     Verify GPU usage by checking AlphaFold logs for GPU-related messages.
     Returns True if there's evidence of GPU usage, False otherwise.
+    Pass result_dir when the caller has already located it to skip the scan.
     """
     try:
-        # Find log files in the output directory
-        log_file = None
-        job_dir = os.path.join(output_dir, job_id)
+        # Look for the results directory unless the caller already found it
+        if result_dir is None:
+            result_dir = find_result_dir(os.path.join(output_dir, job_id))
 
-        # Look for results directories
-        results_dirs = [
-            d for d in os.listdir(job_dir) if os.path.isdir(os.path.join(job_dir, d))
-        ]
-
-        if not results_dirs:
+        if result_dir is None:
             logger.warning(f"No results directory found for job {job_id}")
             return False, "No results directory found"
 
-        result_dir = os.path.join(job_dir, sorted(results_dirs)[-1])
-
-        # Look for log.txt files
-        log_files = [f for f in os.listdir(result_dir) if f == "log.txt"]
+        # Look for log.txt
+        log_file = os.path.join(result_dir, "log.txt")
 
-        if not log_files:
+        if not os.path.isfile(log_file):
             logger.warning(f"No log.txt found in results directory for job {job_id}")
             return False, "No log.txt found"
 
-        log_file = os.path.join(result_dir, log_files[0])
-
         # Check log file for GPU evidence
-        gpu_keywords = [
-            "Using GPU",
-            "CUDA_VISIBLE_DEVICES",
-            "TensorFlow device",
-            "device:GPU",
-            "Found device",
-            "XLA_PYTHON_CLIENT_MEM_FRACTION",
-            "cuda",
-            "jaxlib.xla_extension.GpuDevice",
-        ]
-
         gpu_evidence = []
-        gpu_found = False
 
-        with open(log_file, "r") as f:
-            for line in f:
-                for keyword in gpu_keywords:
-                    if keyword in line:
-                        gpu_evidence.append(line.strip())
-                        gpu_found = True
+        # Scan the whole file in one pass over a memory map and only slice out
+        # the lines that match, stopping once we have enough evidence
+        if os.path.getsize(log_file):
+            with open(log_file, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mm:
+                pos = 0
+                while len(gpu_evidence) < MAX_GPU_EVIDENCE:
+                    match = GPU_KEYWORD_RE_BYTES.search(mm, pos)
+                    if not match:
+                        break
+                    line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                    line_end = mm.find(b"\n", match.end())
+                    if line_end == -1:
+                        line_end = len(mm)
+                    gpu_evidence.append(
+                        mm[line_start:line_end].decode(errors="replace").strip()
+                    )
+                    pos = line_end + 1
 
-        if gpu_found:
+        if gpu_evidence:
             logger.info(f"GPU usage confirmed in AlphaFold logs for job {job_id}")
-            return True, "\n".join(
-                gpu_evidence[:10]
-            )  # Return first 10 pieces of evidence
+            return True, "\n".join(gpu_evidence)
         else:
             logger.warning(
                 f"No evidence of GPU usage found in AlphaFold logs for job {job_id}"
@@ -135,45 +370,124 @@ def verify_alphafold_gpu_usage(job_id, output_dir):
         return False, str(e)
 
 
-def monitor_gpu_during_run(job_id, job_status):
+def sample_gpu_usage(index=0):
     """
-    Periodically monitor GPU usage during an AlphaFold run
-    and update the job status with GPU information.
-    Should be run in a separate thread.
+    Return (utilization, memory_used, memory_total) for one GPU, formatted the
+    same way nvidia-smi reports them, or None if the GPU can't be queried.
     """
+    if init_nvml():
+        try:
+            handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+            rates = _nvml_optional(pynvml.nvmlDeviceGetUtilizationRates, handle)
+            memory = _nvml_optional(pynvml.nvmlDeviceGetMemoryInfo, handle)
+            return (
+                _percent(rates, "gpu"),
+                _mib(memory, "used"),
+                _mib(memory, "total"),
+            )
+        except pynvml.NVMLError as e:
+            logger.error(f"Error sampling GPU {index} through NVML: {e}")
+            return None
+
     try:
-        while job_status.get(job_id, {}).get("status") == "running":
-            # Get GPU usage information using nvidia-smi
-            result = subprocess.run(
-                [
-                    "nvidia-smi",
-                    "--query-gpu=utilization.gpu,memory.used,memory.total",
-                    "--format=csv,noheader",
-                ],
-                capture_output=True,
-                text=True,
+        result = subprocess.run(
+            [
+                "nvidia-smi",
+                f"--id={index}",
+                "--query-gpu=utilization.gpu,memory.used,memory.total",
+                "--format=csv,noheader",
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        return None  # No nvidia-smi on this host
+
+    if result.returncode == 0 and result.stdout:
+        gpu_info = result.stdout.strip().split(",")
+        if len(gpu_info) >= 3:
+            return tuple(value.strip() for value in gpu_info[:3])
+    return None
+
+
+def get_detailed_gpu_info():
+    """
+    Collect per-GPU details keyed as gpu_<index>, using the same field names
+    as `nvidia-smi --query-gpu=... --format=csv`.
+    """
+    detailed_info = {}
+
+    if init_nvml():
+        driver_version = _nvml_str(pynvml.nvmlSystemGetDriverVersion())
+        for i in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+            rates = _nvml_optional(pynvml.nvmlDeviceGetUtilizationRates, handle)
+            memory = _nvml_optional(pynvml.nvmlDeviceGetMemoryInfo, handle)
+            temperature = _nvml_optional(
+                pynvml.nvmlDeviceGetTemperature, handle, pynvml.NVML_TEMPERATURE_GPU
             )
+            detailed_info[f"gpu_{i}"] = {
+                "index": str(i),
+                "name": _nvml_str(pynvml.nvmlDeviceGetName(handle)),
+                "driver_version": driver_version,
+                "temperature.gpu": str(temperature) if temperature is not None else NOT_AVAILABLE,
+                "utilization.gpu [%]": _percent(rates, "gpu"),
+                "utilization.memory [%]": _percent(rates, "memory"),
+                "memory.total [MiB]": _mib(memory, "total"),
+                "memory.free [MiB]": _mib(memory, "free"),
+                "memory.used [MiB]": _mib(memory, "used"),
+            }
+        return detailed_info
 
-            if result.returncode == 0 and result.stdout:
-                gpu_info = result.stdout.strip().split(",")
-                if len(gpu_info) >= 3:
-                    utilization = gpu_info[0].strip()
-                    memory_used = gpu_info[1].strip()
-                    memory_total = gpu_info[2].strip()
-
-                    # Update job status with GPU information
-                    job_status[job_id]["gpu_info"] = {
-                        "utilization": utilization,
-                        "memory_used": memory_used,
-                        "memory_total": memory_total,
-                        "time": int(time.time()),
-                    }
-
-                    logger.info(
-                        f"GPU utilization: {utilization}, Memory: {memory_used}/{memory_total}"
-                    )
+    nvidia_smi = subprocess.run(
+        [
+            "nvidia-smi",
+            "--query-gpu=index,name,driver_version,temperature.gpu,utilization.gpu,utilization.memory,memory.total,memory.free,memory.used",
+            "--format=csv,noheader",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    for i, line in enumerate(nvidia_smi.stdout.strip().splitlines()):
+        values = [v.strip() for v in line.split(",")]
+        detailed_info[f"gpu_{i}"] = dict(zip(DETAILED_GPU_FIELDS, values))
+    return detailed_info
+
+
+def get_gpu_process_pids():
+    """Return the host PIDs of every process running compute work on a GPU."""
+    if init_nvml():
+        pids = set()
+        for i in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+            for process in pynvml.nvmlDeviceGetComputeRunningProcesses(handle):
+                pids.add(process.pid)
+        return pids
+
+    result = subprocess.run(
+        ["nvidia-smi", "--query-compute-apps=pid", "--format=csv,noheader"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {int(pid) for pid in result.stdout.split() if pid.isdigit()}
+
+
+def get_gpu_container_ids():
+    """
+    Return the full IDs of Docker containers that own a GPU process.
+    GPU PIDs are mapped to containers through their cgroup, which also catches
+    processes the container's entrypoint spawned (e.g. AlphaFold's python).
+    """
+    container_ids = set()
+    for pid in get_gpu_process_pids():
+        try:
+            with open(f"/proc/{pid}/cgroup") as f:
+                container_ids.update(CONTAINER_ID_RE.findall(f.read()))
+        except OSError:
+            # Process exited between the GPU query and now
+            continue
+    return container_ids
 
-            # Sleep for 10 seconds before checking again
-            time.sleep(10)
-    except Exception as e:
-        logger.error(f"Error monitoring GPU: {str(e)}")
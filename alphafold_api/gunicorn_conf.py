@@ -0,0 +1,21 @@
+# Gunicorn settings for the AlphaFold API:
+#   gunicorn -c gunicorn_conf.py app:app
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Threads keep /status and /gpu-info responsive while other requests are busy.
+# Job status lives in process memory unless REDIS_URL is set, so only run more
+# than one worker process when the Redis-backed status store is configured.
+# The persistent per-GPU job pool is also per process, and more workers would
+# run several jobs on each GPU, so it always gets a single worker.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+multi_worker_ok = (
+    os.environ.get("REDIS_URL")
+    and os.environ.get("USE_PERSISTENT_WORKER", "1") == "0"
+)
+workers = int(os.environ.get("GUNICORN_WORKERS", 1)) if multi_worker_ok else 1
+
+# AlphaFold jobs run in background threads; don't kill workers on long requests
+timeout = 0
@@ -1,239 +1,487 @@
+import collections
+import fcntl
+import functools
 import logging
 import os
+import posixpath
+import re
+import selectors
 import shutil
 import subprocess
-import time
 import boto3
 import threading
-
-from constants import ALPHAFOLD_REPO, DATA_DIR, OUTPUT_DIR, SEQUENCES_DIR
-from gpu_utils import check_system_gpu, check_docker_gpu_access, verify_alphafold_gpu_usage, monitor_gpu_during_run
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import S3Transfer, TransferConfig
+
+import gpu_poller
+import status_store
+from constants import (
+    ALPHAFOLD_REPO,
+    DATA_DIR,
+    EXTRA_RESULT_FILES,
+    OUTPUT_DIR,
+    S3_MAX_CONCURRENCY,
+    S3_MULTIPART_CHUNKSIZE,
+    SEQUENCES_DIR,
+)
+from gpu_utils import check_system_gpu, check_docker_gpu_access, cuda_available, find_result_dir, verify_alphafold_gpu_usage
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shared S3 client (thread-safe) and transfer manager, created on first upload
+# and reused across jobs. The transfer manager owns one bounded thread pool for
+# multipart parts, instead of boto3 building a fresh pool for every upload_file call
+s3_client = None
+s3_transfer = None
+s3_client_lock = threading.Lock()
+
+# Read buffer for streaming result files to pre-signed URLs
+UPLOAD_READ_BUFFER = 4 * 1024 * 1024
+
+# HTTP session for pre-signed URL uploads, so connections are reused across jobs
+http_session = None
+http_session_lock = threading.Lock()
+
+# Multipart settings for result uploads
+s3_transfer_config = TransferConfig(
+    multipart_threshold=S3_MULTIPART_CHUNKSIZE,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True,
+)
+
+# Have botocore compute a CRC32 of each part while streaming it, for S3 to
+# verify on receipt, instead of a separate hashing pass over the file
+S3_UPLOAD_ARGS = {"ChecksumAlgorithm": "CRC32"}
+
+# Result uploads run here so a finished job doesn't wait on the network
+UPLOAD_WORKERS = 8
+upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="s3-upload")
+
+# Fixed part of the AlphaFold command; only the per-job flags are added per run.
+# Ensure --use_gpu=true is included to force GPU usage
+ALPHAFOLD_CMD_PREFIX = (
+    "python3",
+    os.path.join(ALPHAFOLD_REPO, "docker/run_docker.py"),
+    "--max_template_date=2022-01-01",
+    f"--data_dir={DATA_DIR}",
+    "--use_gpu=true",  # Explicitly enable GPU
+    "--enable_gpu_relax=false",
+)
+
+# Number of trailing stderr lines kept for the error message of a failed run
+STDERR_TAIL_LINES = 4096
+
+# Longest unterminated output line buffered before it is processed anyway
+MAX_PARTIAL_LINE = 64 * 1024
+
+# Kernel buffer size for the AlphaFold output pipes (Linux defaults to 64 KiB),
+# so bursts of log output don't block the child while the reader catches up
+PIPE_BUFFER_SIZE = 1024 * 1024
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+
+# AlphaFold output lines that mention the GPU (in any case)
+GPU_OUTPUT_RE = re.compile(rb"gpu|cuda", re.IGNORECASE)
+
+
+def get_s3_client():
+    """Return the shared boto3 S3 client, resolving credentials only once."""
+    global s3_client
+    if s3_client is None:
+        with s3_client_lock:
+            if s3_client is None:
+                # The shared transfer manager sends at most S3_MAX_CONCURRENCY
+                # requests at once across all uploads; keep a pooled connection
+                # for each, plus a few for calls made outside it
+                s3_client = boto3.client(
+                    "s3",
+                    config=Config(max_pool_connections=S3_MAX_CONCURRENCY + 2),
+                )
+    return s3_client
+
+
+def get_s3_transfer():
+    """Return the shared S3Transfer used for all result uploads."""
+    global s3_transfer
+    if s3_transfer is None:
+        client = get_s3_client()
+        with s3_client_lock:
+            if s3_transfer is None:
+                s3_transfer = S3Transfer(client, s3_transfer_config)
+    return s3_transfer
+
+
+def link_or_copy(src, dst):
+    """
+    Make src available at dst. A hard link avoids copying any bytes; fall back
+    to a copy when linking isn't possible (e.g. across filesystems).
+    """
+    if os.path.lexists(dst):
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
+
+
+def put_presigned(url, file_path):
+    """PUT a file to a pre-signed URL over the shared keep-alive HTTP session."""
+    global http_session
+    if http_session is None:
+        with http_session_lock:
+            if http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+                http_session = session
+
+    # Read the file in large blocks (the HTTP layer asks for ~16 KiB at a time)
+    # and give the length up front so the body is sent as one fixed-size PUT
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb", buffering=UPLOAD_READ_BUFFER) as f:
+        return http_session.put(url, data=f, headers={"Content-Length": str(size)})
+
+
+def upload_result(job_id, file_path, s3_bucket, s3_key, storage_url=None, track_progress=True):
+    """
+    Upload a result file to S3, falling back to the pre-signed URL if boto3 fails.
+    Progress is reported on the job only when track_progress is set.
+    Returns True if the file was uploaded.
+    """
+    result_file = os.path.basename(file_path)
+    try:
+        # Upload file to S3 using boto3
+        logger.info(f"Uploading results to S3 bucket {s3_bucket} with key {s3_key}")
+        # Progress callback for upload. boto3 reports the bytes sent
+        # since the previous call (possibly from several threads),
+        # so keep a running total and only write whole-percent changes
+        file_size = os.path.getsize(file_path) or 1
+        progress_lock = threading.Lock()
+        transferred = [0, -1]  # bytes so far, last reported percent
+
+        def upload_progress(bytes_transferred):
+            if not track_progress:
+                return
+            with progress_lock:
+                transferred[0] += bytes_transferred
+                pct = min(transferred[0] * 100 // file_size, 99)  # Cap at 99% until fully complete
+                if pct == transferred[1]:
+                    return
+                transferred[1] = pct
+            status_store.update(job_id, upload_progress=pct)
+
+        # Upload the file with progress tracking, in parallel parts when large
+        get_s3_transfer().upload_file(
+            file_path,
+            s3_bucket,
+            s3_key,
+            callback=upload_progress,
+            extra_args=S3_UPLOAD_ARGS,
+        )
+
+        logger.info(f"Successfully uploaded {result_file} to S3 for job {job_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Error uploading to S3 with boto3: {str(e)}")
+
+        # Fallback to pre-signed URL if available
+        if storage_url:
+            try:
+                logger.info("Falling back to pre-signed URL upload method")
+                response = put_presigned(storage_url, file_path)
+
+                if response.status_code == 200:
+                    logger.info(f"Successfully uploaded {result_file} to S3 using pre-signed URL for job {job_id}")
+                    return True
+                else:
+                    logger.error(f"Failed to upload to S3 with pre-signed URL: {response.status_code} {response.text}")
+            except Exception as e2:
+                logger.error(f"Error uploading to S3 with pre-signed URL: {str(e2)}")
+    return False
+
+
+def upload_artifacts(job_id, result_dir, s3_bucket, s3_key):
+    """
+    Upload the EXTRA_RESULT_FILES found in result_dir next to the result key,
+    recording each one in the job's s3_artifact_keys once it has been uploaded.
+    """
+    artifact_prefix = posixpath.splitext(s3_key)[0]
+    uploaded = {}
+    uploaded_lock = threading.Lock()
+
+    def record_upload(artifact, artifact_key, future):
+        if not future.result():
+            return
+        with uploaded_lock:
+            uploaded[artifact] = artifact_key
+            status_store.update(job_id, s3_artifact_keys=dict(uploaded))
+
+    for artifact in EXTRA_RESULT_FILES:
+        artifact_path = os.path.join(result_dir, artifact)
+        if not os.path.isfile(artifact_path):
+            logger.warning(f"Extra result file {artifact} not found for job {job_id}")
+            continue
+        artifact_key = f"{artifact_prefix}/{artifact}"
+        upload = upload_pool.submit(
+            upload_result,
+            job_id,
+            artifact_path,
+            s3_bucket,
+            artifact_key,
+            track_progress=False,
+        )
+        upload.add_done_callback(functools.partial(record_upload, artifact, artifact_key))
+
 
-def run_alphafold(job_id, sequence, name, job_status, storage_url=None, bucket_name=None, object_key=None):
-    """Function to run AlphaFold in a separate thread"""
+def run_alphafold(job_id, sequence, name, storage_url=None, bucket_name=None, object_key=None, *, gpu_devices=None, cpu_core=None):
+    """
+    Function to run AlphaFold in a separate thread.
+    gpu_devices restricts the AlphaFold container to the given GPU index(es),
+    and cpu_core pins the AlphaFold launcher process to that CPU core.
+    """
     try:
         # Update job status
-        job_status[job_id] = {
-            "status": "running",
-            "progress": 0,
-        }
+        status_store.replace(job_id, status="running", progress=0)
+
+        # Check GPU availability before starting. Without a CUDA driver there is
+        # nothing for nvidia-smi or a CUDA container to find, so skip both probes
+        if cuda_available():
+            gpu_available, gpu_info = check_system_gpu()
+            docker_gpu, docker_gpu_info = check_docker_gpu_access()
+        else:
+            gpu_available, gpu_info = False, "CUDA driver not available"
+            docker_gpu, docker_gpu_info = False, "Skipped: no CUDA driver on host"
 
-        # Check GPU availability before starting
-        gpu_available, gpu_info = check_system_gpu()
-        job_status[job_id]["gpu_available"] = gpu_available
-        job_status[job_id]["gpu_info"] = gpu_info
+        status_store.update(job_id, gpu_available=gpu_available, gpu_info=gpu_info)
 
         if gpu_available:
             logger.info(f"GPU is available for job {job_id}: {gpu_info}")
         else:
             logger.warning(f"GPU is not available for job {job_id}: {gpu_info}")
 
-        # Check Docker GPU access
-        docker_gpu, docker_gpu_info = check_docker_gpu_access()
-        job_status[job_id]["docker_gpu_access"] = docker_gpu
-        job_status[job_id]["docker_gpu_info"] = docker_gpu_info
+        # Record Docker GPU access
+        status_store.update(
+            job_id, docker_gpu_access=docker_gpu, docker_gpu_info=docker_gpu_info
+        )
 
         if docker_gpu:
             logger.info(f"Docker has GPU access for job {job_id}")
         else:
             logger.warning(f"Docker does not have GPU access for job {job_id}: {docker_gpu_info}")
 
-        # Start GPU monitoring in a separate thread
-        monitor_thread = threading.Thread(
-            target=monitor_gpu_during_run,
-            args=(job_id, job_status)
-        )
-        monitor_thread.daemon = True  # Thread will exit when main thread exits
-        monitor_thread.start()
+        # Report GPU usage through the shared poller while the job runs
+        if gpu_available:
+            gpu_poller.subscribe(
+                job_id, int(gpu_devices) if gpu_devices and gpu_devices.isdigit() else 0
+            )
 
         if bucket_name and object_key:
-            job_status[job_id]["s3_bucket"] = bucket_name
-            job_status[job_id]["s3_key"] = object_key
+            status_store.update(job_id, s3_bucket=bucket_name, s3_key=object_key)
         elif storage_url:
-            job_status[job_id]["storage_url"] = storage_url
+            status_store.update(job_id, storage_url=storage_url)
 
         job_dir = os.path.join(OUTPUT_DIR, job_id)
         os.makedirs(job_dir, exist_ok=True)
 
         fasta_path = os.path.join(SEQUENCES_DIR, f"{job_id}.fasta")
-        with open(fasta_path, "w") as f:
-            f.write(f">{name}\n{sequence}\n")
+        fasta = b">" + name.encode() + b"\n" + sequence.encode() + b"\n"
+        fd = os.open(fasta_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+        try:
+            os.write(fd, fasta)
+        finally:
+            os.close(fd)
 
-        # Ensure --use_gpu=true is included to force GPU usage
         cmd = [
-            "python3",
-            os.path.join(ALPHAFOLD_REPO, "docker/run_docker.py"),
+            *ALPHAFOLD_CMD_PREFIX,
             f"--fasta_paths={fasta_path}",
-            f"--max_template_date=2022-01-01",
-            f"--data_dir={DATA_DIR}",
             f"--output_dir={job_dir}",
-            "--use_gpu=true",  # Explicitly enable GPU
-            "--enable_gpu_relax=false"
         ]
+        if gpu_devices is not None:
+            cmd.append(f"--gpu_devices={gpu_devices}")
 
         logger.info(f"Starting AlphaFold for job {job_id}")
         logger.info(f"Command: {' '.join(cmd)}")
 
         process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
         )
+        if cpu_core is not None:
+            os.sched_setaffinity(process.pid, {cpu_core})
+            logger.info(f"Pinned AlphaFold for job {job_id} to CPU {cpu_core}")
+
+        # Watch stdout and stderr together so progress is picked up as soon as
+        # AlphaFold prints it and neither pipe can fill up and stall the child
+        selector = selectors.DefaultSelector()
+        partial_lines = {}
+        for stream in (process.stdout, process.stderr):
+            try:
+                fcntl.fcntl(stream.fileno(), F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+            except OSError:
+                pass  # Above /proc/sys/fs/pipe-max-size; keep the default
+            os.set_blocking(stream.fileno(), False)
+            selector.register(stream, selectors.EVENT_READ)
+            partial_lines[stream] = b""
 
         # Monitor process and update progress
         gpu_usage_detected = False
-        while process.poll() is None:
-            line = process.stdout.readline()
-            if line:
-                logger.info(f"AlphaFold output: {line.strip()}")
-
-                # Look for evidence of GPU usage in the output
-                if any(keyword in line for keyword in ["GPU", "gpu", "CUDA", "cuda", "device:GPU"]):
-                    gpu_usage_detected = True
-                    job_status[job_id]["gpu_usage_detected"] = True
-                    job_status[job_id]["gpu_evidence"] = line.strip()
-
-                # Update progress based on output (simplified example)
-                if "Running model" in line:
-                    job_status[job_id]["progress"] = 30
-                elif "Relaxing structure" in line:
-                    job_status[job_id]["progress"] = 70
-            time.sleep(1)
-
-        # Get any remaining output
-        stdout, stderr = process.communicate()
+        progress = 0
+        stderr_lines = collections.deque(maxlen=STDERR_TAIL_LINES)
+        log_output = logger.isEnabledFor(logging.INFO)
+        while selector.get_map():
+            # Blocks until a pipe has data or hits EOF; no periodic wakeups
+            for key, _ in selector.select():
+                stream = key.fileobj
+                data = os.read(stream.fileno(), 65536)
+                if data:
+                    *lines, partial = (partial_lines[stream] + data).split(b"\n")
+                    # Output without newlines (e.g. progress bars) would otherwise
+                    # accumulate without bound; hand it on as a line once it's long
+                    if len(partial) > MAX_PARTIAL_LINE:
+                        lines.append(partial)
+                        partial = b""
+                    partial_lines[stream] = partial
+                else:
+                    # EOF: flush whatever is left without a trailing newline
+                    selector.unregister(stream)
+                    lines = [partial_lines[stream]] if partial_lines[stream] else []
+
+                for line in lines:
+                    # Lines stay as bytes; only decode the ones that are used
+                    if stream is process.stderr:
+                        stderr_lines.append(line)
+                        continue
+
+                    if log_output:
+                        logger.info(f"AlphaFold output: {line.decode(errors='replace').strip()}")
+
+                    # Look for evidence of GPU usage in the output; the first hit is enough
+                    if not gpu_usage_detected and GPU_OUTPUT_RE.search(line):
+                        gpu_usage_detected = True
+                        status_store.update(
+                            job_id,
+                            gpu_usage_detected=True,
+                            gpu_evidence=line.decode(errors="replace").strip(),
+                        )
+
+                    # Update progress based on output (simplified example);
+                    # markers for stages already reached aren't looked for again
+                    if progress < 30 and b"Running model" in line:
+                        progress = 30
+                        status_store.update(job_id, progress=progress)
+                    elif progress < 70 and b"Relaxing structure" in line:
+                        progress = 70
+                        status_store.update(job_id, progress=progress)
+        selector.close()
+
+        process.wait()
+        gpu_poller.unsubscribe(job_id)
 
         # Check if process completed successfully
         if process.returncode == 0:
             logger.info(f"AlphaFold completed successfully for job {job_id}")
 
-            # Verify GPU usage in logs after completion
-            gpu_used, gpu_evidence = verify_alphafold_gpu_usage(job_id, OUTPUT_DIR)
-            job_status[job_id]["gpu_verification"] = {
-                "gpu_used": gpu_used,
-                "evidence": gpu_evidence
-            }
-
-            # Find the results directory (named after the FASTA file)
-            results_dirs = [
-                d
-                for d in os.listdir(job_dir)
-                if os.path.isdir(os.path.join(job_dir, d))
-            ]
-            if results_dirs:
-                # Get the latest results directory
-                result_dir = os.path.join(job_dir, sorted(results_dirs)[-1])
+            # Find the latest results directory (named after the FASTA file)
+            result_dir = find_result_dir(job_dir)
+            status_store.update(job_id, result_dir=result_dir)
 
+            # Verify GPU usage in logs after completion
+            gpu_used, gpu_evidence = verify_alphafold_gpu_usage(
+                job_id, OUTPUT_DIR, result_dir=result_dir
+            )
+            status_store.update(
+                job_id,
+                gpu_verification={"gpu_used": gpu_used, "evidence": gpu_evidence},
+            )
+
+            if result_dir:
                 # Look for the final PDB file (ranked_0.pdb is the top model)
-                pdb_files = [
-                    f
-                    for f in os.listdir(result_dir)
-                    if f.endswith(".pdb") and "ranked_0" in f
-                ]
-
-                if pdb_files:
-                    result_file = pdb_files[0]
-                    file_path = os.path.join(result_dir, result_file)
-
-                    # Upload to S3 using boto3 if bucket info was provided
-                    s3_uploaded = False
-                    s3_bucket = job_status[job_id].get("s3_bucket")
-                    s3_key = job_status[job_id].get("s3_key")
-
-                    if s3_bucket and s3_key:
-                        try:
-                            # Upload file to S3 using boto3
-                            logger.info(f"Uploading results to S3 bucket {s3_bucket} with key {s3_key}")
-                            s3_client = boto3.client('s3')
-
-                            # Progress callback for upload
-                            def upload_progress(bytes_transferred):
-                                # Only update for significant progress changes to avoid excessive logging
-                                job_status[job_id]["upload_progress"] = min(
-                                    int((bytes_transferred / os.path.getsize(file_path)) * 100),
-                                    99  # Cap at 99% until fully complete
-                                )
-
-                            # Upload the file with progress tracking
-                            with open(file_path, 'rb') as file_data:
-                                s3_client.upload_fileobj(
-                                    file_data,
-                                    s3_bucket,
-                                    s3_key,
-                                    Callback=upload_progress
-                                )
-
-                            s3_uploaded = True
-                            logger.info(f"Successfully uploaded {result_file} to S3 for job {job_id}")
-                        except Exception as e:
-                            logger.error(f"Error uploading to S3 with boto3: {str(e)}")
-
-                            # Fallback to pre-signed URL if available
-                            s3_url = job_status[job_id].get("storage_url")
-                            if s3_url:
-                                try:
-                                    import requests
-                                    logger.info("Falling back to pre-signed URL upload method")
-                                    with open(file_path, "rb") as f:
-                                        response = requests.put(s3_url, data=f)
-
-                                    if response.status_code == 200:
-                                        s3_uploaded = True
-                                        logger.info(f"Successfully uploaded {result_file} to S3 using pre-signed URL for job {job_id}")
-                                    else:
-                                        logger.error(f"Failed to upload to S3 with pre-signed URL: {response.status_code} {response.text}")
-                                except Exception as e2:
-                                    logger.error(f"Error uploading to S3 with pre-signed URL: {str(e2)}")
-
-                    # Copy the file to a known location for easier access
+                with os.scandir(result_dir) as entries:
+                    file_path = next(
+                        (
+                            entry.path
+                            for entry in entries
+                            if entry.name.endswith(".pdb") and "ranked_0" in entry.name
+                        ),
+                        None,
+                    )
+
+                if file_path:
+
+                    status = status_store.get(job_id) or {}
+                    s3_bucket = status.get("s3_bucket")
+                    s3_key = status.get("s3_key")
+
+                    # Link the file to a known location for easier access
                     output_file = os.path.join(job_dir, "ranked_0.pdb")
-                    shutil.copy(file_path, output_file)
-
-                    job_status[job_id] = {
-                        "status": "completed",
-                        "progress": 100,
-                        "result_file": output_file,
-                        "s3_uploaded": s3_uploaded,
-                        "gpu_available": gpu_available,
-                        "gpu_info": gpu_info,
-                        "docker_gpu_access": docker_gpu,
-                        "gpu_usage_detected": gpu_usage_detected,
-                        "gpu_verification": {
-                            "gpu_used": gpu_used,
-                            "evidence": gpu_evidence
-                        }
-                    }
+                    link_or_copy(file_path, output_file)
+                    result_stat = os.stat(output_file)
+
+                    status_store.update(
+                        job_id,
+                        status="completed",
+                        progress=100,
+                        result_file=output_file,
+                        result_mtime=result_stat.st_mtime,
+                        result_dir=result_dir,
+                        s3_uploaded=False,
+                        gpu_info=gpu_info,
+                        gpu_usage_detected=gpu_usage_detected,
+                    )
+
+                    # Upload to S3 in the background if bucket info was provided;
+                    # the result is already available locally, so don't hold the job
+                    if s3_bucket and s3_key:
+                        upload = upload_pool.submit(
+                            upload_result,
+                            job_id,
+                            file_path,
+                            s3_bucket,
+                            s3_key,
+                            status.get("storage_url"),
+                        )
+                        upload.add_done_callback(
+                            lambda future: status_store.update(
+                                job_id, s3_uploaded=future.result()
+                            )
+                        )
+
+                        # Upload any requested extra artifacts alongside, in parallel
+                        upload_artifacts(job_id, result_dir, s3_bucket, s3_key)
                 else:
-                    job_status[job_id] = {
-                        "status": "error",
-                        "message": "No PDB files found in results directory",
-                        "gpu_available": gpu_available,
-                        "gpu_info": gpu_info,
-                        "docker_gpu_access": docker_gpu,
-                        "gpu_usage_detected": gpu_usage_detected
-                    }
+                    status_store.update(
+                        job_id,
+                        status="error",
+                        message="No PDB files found in results directory",
+                        gpu_info=gpu_info,
+                        gpu_usage_detected=gpu_usage_detected,
+                    )
             else:
-                job_status[job_id] = {
-                    "status": "error",
-                    "message": "No results directory found",
-                    "gpu_available": gpu_available,
-                    "gpu_info": gpu_info,
-                    "docker_gpu_access": docker_gpu,
-                    "gpu_usage_detected": gpu_usage_detected
-                }
+                status_store.update(
+                    job_id,
+                    status="error",
+                    message="No results directory found",
+                    gpu_info=gpu_info,
+                    gpu_usage_detected=gpu_usage_detected,
+                )
         else:
+            stderr = b"\n".join(stderr_lines).decode(errors="replace")
             logger.error(f"AlphaFold failed for job {job_id}: {stderr}")
-            job_status[job_id] = {
-                "status": "error",
-                "message": stderr,
-                "gpu_available": gpu_available,
-                "gpu_info": gpu_info,
-                "docker_gpu_access": docker_gpu,
-                "gpu_usage_detected": gpu_usage_detected
-            }
+            status_store.update(
+                job_id,
+                status="error",
+                message=stderr,
+                gpu_info=gpu_info,
+                gpu_usage_detected=gpu_usage_detected,
+            )
 
     except Exception as e:
         logger.error(f"Error running AlphaFold for job {job_id}: {str(e)}")
-        job_status[job_id] = {"status": "error", "message": str(e)}
+        status_store.update(job_id, status="error", message=str(e))
+    finally:
+        gpu_poller.unsubscribe(job_id)
@@ -48,7 +48,7 @@ sudo docker build -f docker/Dockerfile -t alphafold .
 
 # Install Python and dependencies for the Flask API
 sudo apt-get install -y python3 python3-pip
-pip3 install flask flask-cors gunicorn requests
+pip3 install flask flask-cors gunicorn requests nvidia-ml-py docker
 
 # Install Python requirements for running the Docker container
 pip3 install -r docker/requirements.txt
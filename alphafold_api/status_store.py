@@ -0,0 +1,122 @@
+import json
+import logging
+import threading
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from constants import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "job:"
+
+
+class MemoryStore:
+    """In-process job store for development and single-worker deployments."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            status = self._jobs.get(job_id)
+            return dict(status) if status is not None else None
+
+    def replace(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id] = fields
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            self._jobs.setdefault(job_id, {}).update(fields)
+
+    def iter_jobs(self):
+        with self._lock:
+            snapshot = [(job_id, dict(status)) for job_id, status in self._jobs.items()]
+        return iter(snapshot)
+
+
+class RedisStore:
+    """
+    Job store shared by every API process: one Redis hash per job, with each
+    field JSON-encoded so nested values (e.g. gpu_verification) round-trip.
+    """
+
+    def __init__(self, url):
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, job_id):
+        return self._decode(self._redis.hgetall(KEY_PREFIX + job_id))
+
+    def replace(self, job_id, **fields):
+        pipe = self._redis.pipeline()
+        pipe.delete(KEY_PREFIX + job_id)
+        if fields:
+            pipe.hset(KEY_PREFIX + job_id, mapping=self._encode(fields))
+        pipe.execute()
+
+    def update(self, job_id, **fields):
+        if fields:
+            self._redis.hset(KEY_PREFIX + job_id, mapping=self._encode(fields))
+
+    def iter_jobs(self):
+        # Fetch each SCAN page's hashes in one pipelined round trip
+        cursor = 0
+        while True:
+            cursor, keys = self._redis.scan(cursor, match=KEY_PREFIX + "*")
+            if keys:
+                pipe = self._redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.hgetall(key)
+                for key, fields in zip(keys, pipe.execute()):
+                    status = self._decode(fields)
+                    if status is not None:
+                        yield key.decode()[len(KEY_PREFIX):], status
+            if cursor == 0:
+                break
+
+    @staticmethod
+    def _encode(fields):
+        return {key: json.dumps(value) for key, value in fields.items()}
+
+    @staticmethod
+    def _decode(fields):
+        if not fields:
+            return None
+        return {key.decode(): json.loads(value) for key, value in fields.items()}
+
+
+def _create_store():
+    if REDIS_URL:
+        if redis is not None:
+            logger.info("Using Redis job status store")
+            return RedisStore(REDIS_URL)
+        logger.warning("REDIS_URL is set but redis is not installed, using in-memory job status store")
+    return MemoryStore()
+
+
+_store = _create_store()
+
+
+def get(job_id):
+    """Return a copy of the job's status, or None if the job is unknown."""
+    return _store.get(job_id)
+
+
+def replace(job_id, **fields):
+    """Replace the job's status with the given fields."""
+    _store.replace(job_id, **fields)
+
+
+def update(job_id, **fields):
+    """Merge the given fields into the job's status."""
+    _store.update(job_id, **fields)
+
+
+def iter_jobs():
+    """Yield (job_id, status) for every known job."""
+    return _store.iter_jobs()